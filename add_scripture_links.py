@@ -1,10 +1,63 @@
 import re
 import csv
-import difflib
 import sys
 import glob
 import os
-import argparse
+
+# Modules only needed by the command line or by some modes (argparse, time,
+# difflib, subprocess, tempfile, shutil, hashlib, fcntl) are imported where
+# they are used to keep startup fast.
+
+USFM_BOOK_CODES = {
+    "Genesis": "GEN", "Gen": "GEN", "Exodus": "EXO", "Exo": "EXO", "Leviticus": "LEV", "Lev": "LEV", "Numbers": "NUM", "Num": "NUM",
+    "Deuteronomy": "DEU", "Deut": "DEU", "Joshua": "JOS", "Josh": "JOS", "Judges": "JDG", "Judg": "JDG", "Ruth": "RUT",
+    "1 Samuel": "1SA", "1 Sam": "1SA", "2 Samuel": "2SA", "2 Sam": "2SA", "1 Kings": "1KI", "1 Kgs": "1KI", "2 Kings": "2KI", "2 Kgs": "2KI",
+    "1 Chronicles": "1CH", "1 Chr": "1CH", "2 Chronicles": "2CH", "2 Chr": "2CH", "Ezra": "EZR", "Nehemiah": "NEH", "Neh": "NEH",
+    "Esther": "EST", "Job": "JOB", "Psalms": "PSA", "Psalm": "PSA", "Psa": "PSA", "Proverbs": "PRO", "Prov": "PRO",
+    "Ecclesiastes": "ECC", "Eccl": "ECC", "Song of Songs": "SNG", "Song": "SNG", "Isaiah": "ISA", "Isa": "ISA",
+    "Jeremiah": "JER", "Jer": "JER", "Lamentations": "LAM", "Lam": "LAM", "Ezekiel": "EZK", "Ezek": "EZK", "Daniel": "DAN", "Dan": "DAN",
+    "Hosea": "HOS", "Joel": "JOL", "Amos": "AMO", "Obadiah": "OBA", "Obad": "OBA",
+    "Jonah": "JON", "Micah": "MIC", "Nahum": "NAM", "Habakkuk": "HAB", "Hab": "HAB",
+    "Zephaniah": "ZEP", "Zeph": "ZEP", "Haggai": "HAG", "Hag": "HAG", "Zechariah": "ZEC", "Zech": "ZEC", "Malachi": "MAL", "Mal": "MAL",
+    "Matthew": "MAT", "Matt": "MAT", "Mat": "MAT", "Mark": "MRK", "Luke": "LUK", "John": "JHN",
+    "Acts": "ACT", "Act": "ACT", "Romans": "ROM", "Rom": "ROM", "1 Corinthians": "1CO", "1 Cor": "1CO", "2 Corinthians": "2CO", "2 Cor": "2CO",
+    "Galatians": "GAL", "Gal": "GAL", "Ephesians": "EPH", "Eph": "EPH", "Philippians": "PHP", "Phil": "PHP", "Colossians": "COL", "Col": "COL",
+    "1 Thessalonians": "1TH", "1 Thess": "1TH", "2 Thessalonians": "2TH", "2 Thess": "2TH", "1 Timothy": "1TI", "1 Tim": "1TI",
+    "2 Timothy": "2TI", "2 Tim": "2TI", "Titus": "TIT", "Philemon": "PHM", "Phlm": "PHM", "Hebrews": "HEB", "Heb": "HEB",
+    "James": "JAS", "Jas": "JAS", "1 Peter": "1PE", "1 Pet": "1PE", "2 Peter": "2PE", "2 Pet": "2PE", "1 John": "1JN", "1 Jn": "1JN",
+    "2 John": "2JN", "2 Jn": "2JN", "3 John": "3JN", "3 Jn": "3JN", "Jude": "JUD", "Revelation": "REV", "Rev": "REV"
+}
+
+# Books with only one chapter
+SINGLE_CHAPTER_BOOKS = {"OBA", "PHM", "2JN", "3JN", "JUD"}
+
+# Pattern 1: Book name followed by chapter/verse (e.g., "Gen 1:1", "Psalms 2, 8, 16")
+BOOK_REFERENCE_PATTERN = r'\b((?:[1-3] )?(?:Genesis|Gen|Exodus|Exo|Leviticus|Lev|Numbers|Num|Deuteronomy|Deut|Joshua|Josh|Judges|Judg|Ruth|1 Samuel|1 Sam|2 Samuel|2 Sam|1 Kings|1 Kgs|2 Kings|2 Kgs|1 Chronicles|1 Chr|2 Chronicles|2 Chr|Ezra|Nehemiah|Neh|Esther|Job|Psalms|Psalm|Psa|Proverbs|Prov|Ecclesiastes|Eccl|Song of Songs|Song|Isaiah|Isa|Jeremiah|Jer|Lamentations|Lam|Ezekiel|Ezek|Daniel|Dan|Hosea|Joel|Amos|Obadiah|Obad|Jonah|Micah|Nahum|Habakkuk|Hab|Zephaniah|Zeph|Haggai|Hag|Zechariah|Zech|Malachi|Mal|Matthew|Matt|Mat|Mark|Luke|John|Acts|Act|Romans|Rom|1 Corinthians|1 Cor|2 Corinthians|2 Cor|Galatians|Gal|Ephesians|Eph|Philippians|Phil|Colossians|Col|1 Thessalonians|1 Thess|2 Thessalonians|2 Thess|1 Timothy|1 Tim|2 Timothy|2 Tim|Titus|Philemon|Phlm|Hebrews|Heb|James|Jas|1 Peter|1 Pet|2 Peter|2 Pet|1 John|1 Jn|2 John|2 Jn|3 John|3 Jn|Jude|Revelation|Rev))\s+(\d+(?::\d+(?:[-–]\d+)?)?(?:[,;]\s*\d+(?::\d+(?:[-–]\d+)?)?)*)'
+
+# Pattern 2: Chapter/verse references (e.g., "chapter 5", "verses 12-15", "5:12", "1:1–6:7")
+CHAPTER_VERSE_PATTERN = r'\b(?:(chapters?)\s+(\d+(?:[-–]\d+)?(?:[,;]\s*(?:and\s+|or\s+)?\d+(?:[-–]\d+)?)*(?:\s+(?:and|or)\s+\d+(?:[-–]\d+)?)?)|(verses?)\s+(\d+(?:[-–]\d+)?(?:[,;]\s*(?:and\s+|or\s+)?\d+(?:[-–]\d+)?)*(?:\s+(?:and|or)\s+\d+(?:[-–]\d+)?)?)|(\d+):(\d+(?:[-–]\d+(?::\d+)?)?))\b'
+
+MARKDOWN_LINK_PATTERN = r'\[([^\]]+)\]\([^)]+\)'
+
+# Compiled patterns and lookups, built on first use by get_reference_matchers()
+_reference_matchers = None
+
+
+def get_reference_matchers():
+    """Return the compiled reference patterns and the lowercase book name lookup, building them once"""
+    global _reference_matchers
+    if _reference_matchers is None:
+        book_codes_by_name = {}
+        for name, code in USFM_BOOK_CODES.items():
+            book_codes_by_name.setdefault(name.lower(), code)
+        _reference_matchers = (
+            re.compile(BOOK_REFERENCE_PATTERN),
+            re.compile(CHAPTER_VERSE_PATTERN),
+            re.compile(MARKDOWN_LINK_PATTERN),
+            book_codes_by_name,
+        )
+    return _reference_matchers
+
 
 def extract_chapter_verse_pairs(reference_string, starting_chapter=None):
     results = []
@@ -25,6 +78,7 @@ def extract_chapter_verse_pairs(reference_string, starting_chapter=None):
     return results
 
 def get_diff_excerpt(a, b):
+    import difflib
     sm = difflib.SequenceMatcher(None, a, b)
     diffs_orig = []
     diffs_repl = []
@@ -36,36 +90,16 @@ def get_diff_excerpt(a, b):
 
 
 
-def add_verse_codes_to_column(rows, book_code):
-    usfm_book_codes = {
-        "Genesis": "GEN", "Gen": "GEN", "Exodus": "EXO", "Exo": "EXO", "Leviticus": "LEV", "Lev": "LEV", "Numbers": "NUM", "Num": "NUM",
-        "Deuteronomy": "DEU", "Deut": "DEU", "Joshua": "JOS", "Josh": "JOS", "Judges": "JDG", "Judg": "JDG", "Ruth": "RUT",
-        "1 Samuel": "1SA", "1 Sam": "1SA", "2 Samuel": "2SA", "2 Sam": "2SA", "1 Kings": "1KI", "1 Kgs": "1KI", "2 Kings": "2KI", "2 Kgs": "2KI",
-        "1 Chronicles": "1CH", "1 Chr": "1CH", "2 Chronicles": "2CH", "2 Chr": "2CH", "Ezra": "EZR", "Nehemiah": "NEH", "Neh": "NEH",
-        "Esther": "EST", "Job": "JOB", "Psalms": "PSA", "Psalm": "PSA", "Psa": "PSA", "Proverbs": "PRO", "Prov": "PRO",
-        "Ecclesiastes": "ECC", "Eccl": "ECC", "Song of Songs": "SNG", "Song": "SNG", "Isaiah": "ISA", "Isa": "ISA",
-        "Jeremiah": "JER", "Jer": "JER", "Lamentations": "LAM", "Lam": "LAM", "Ezekiel": "EZK", "Ezek": "EZK", "Daniel": "DAN", "Dan": "DAN",
-        "Hosea": "HOS", "Joel": "JOL", "Amos": "AMO", "Obadiah": "OBA", "Obad": "OBA",
-        "Jonah": "JON", "Micah": "MIC", "Nahum": "NAM", "Habakkuk": "HAB", "Hab": "HAB",
-        "Zephaniah": "ZEP", "Zeph": "ZEP", "Haggai": "HAG", "Hag": "HAG", "Zechariah": "ZEC", "Zech": "ZEC", "Malachi": "MAL", "Mal": "MAL",
-        "Matthew": "MAT", "Matt": "MAT", "Mat": "MAT", "Mark": "MRK", "Luke": "LUK", "John": "JHN",
-        "Acts": "ACT", "Act": "ACT", "Romans": "ROM", "Rom": "ROM", "1 Corinthians": "1CO", "1 Cor": "1CO", "2 Corinthians": "2CO", "2 Cor": "2CO",
-        "Galatians": "GAL", "Gal": "GAL", "Ephesians": "EPH", "Eph": "EPH", "Philippians": "PHP", "Phil": "PHP", "Colossians": "COL", "Col": "COL",
-        "1 Thessalonians": "1TH", "1 Thess": "1TH", "2 Thessalonians": "2TH", "2 Thess": "2TH", "1 Timothy": "1TI", "1 Tim": "1TI",
-        "2 Timothy": "2TI", "2 Tim": "2TI", "Titus": "TIT", "Philemon": "PHM", "Phlm": "PHM", "Hebrews": "HEB", "Heb": "HEB",
-        "James": "JAS", "Jas": "JAS", "1 Peter": "1PE", "1 Pet": "1PE", "2 Peter": "2PE", "2 Pet": "2PE", "1 John": "1JN", "1 Jn": "1JN",
-        "2 John": "2JN", "2 Jn": "2JN", "3 John": "3JN", "3 Jn": "3JN", "Jude": "JUD", "Revelation": "REV", "Rev": "REV"
-    }
-    
-    # Books with only one chapter
-    single_chapter_books = {"OBA", "PHM", "2JN", "3JN", "JUD"}
+def add_verse_codes_to_column(rows, book_code, only_rows=None, stop_at_first_change=False):
+    book_pattern, chapter_verse_pattern, link_pattern, book_codes_by_name = get_reference_matchers()
+    single_chapter_books = SINGLE_CHAPTER_BOOKS
 
     processed = []
     changes = []  # To store (ID, original_text, replaced_text)
 
     for i, row in enumerate(rows):
-        # Skip header row
-        if i == 0:
+        # Skip header row, and rows outside the requested subset
+        if i == 0 or (only_rows is not None and i not in only_rows):
             processed.append(row)
             continue
             
@@ -90,11 +124,8 @@ def add_verse_codes_to_column(rows, book_code):
 
         if original:
             # Find all Bible references in the text
-            # Pattern 1: Book name followed by chapter/verse (e.g., "Gen 1:1", "Psalms 2, 8, 16")
-            book_refs = re.finditer(r'\b((?:[1-3] )?(?:Genesis|Gen|Exodus|Exo|Leviticus|Lev|Numbers|Num|Deuteronomy|Deut|Joshua|Josh|Judges|Judg|Ruth|1 Samuel|1 Sam|2 Samuel|2 Sam|1 Kings|1 Kgs|2 Kings|2 Kgs|1 Chronicles|1 Chr|2 Chronicles|2 Chr|Ezra|Nehemiah|Neh|Esther|Job|Psalms|Psalm|Psa|Proverbs|Prov|Ecclesiastes|Eccl|Song of Songs|Song|Isaiah|Isa|Jeremiah|Jer|Lamentations|Lam|Ezekiel|Ezek|Daniel|Dan|Hosea|Joel|Amos|Obadiah|Obad|Jonah|Micah|Nahum|Habakkuk|Hab|Zephaniah|Zeph|Haggai|Hag|Zechariah|Zech|Malachi|Mal|Matthew|Matt|Mat|Mark|Luke|John|Acts|Act|Romans|Rom|1 Corinthians|1 Cor|2 Corinthians|2 Cor|Galatians|Gal|Ephesians|Eph|Philippians|Phil|Colossians|Col|1 Thessalonians|1 Thess|2 Thessalonians|2 Thess|1 Timothy|1 Tim|2 Timothy|2 Tim|Titus|Philemon|Phlm|Hebrews|Heb|James|Jas|1 Peter|1 Pet|2 Peter|2 Pet|1 John|1 Jn|2 John|2 Jn|3 John|3 Jn|Jude|Revelation|Rev))\s+(\d+(?::\d+(?:[-–]\d+)?)?(?:[,;]\s*\d+(?::\d+(?:[-–]\d+)?)?)*)', original)
-            
-            # Pattern 2: Chapter/verse references (e.g., "chapter 5", "verses 12-15", "5:12", "1:1–6:7")
-            chapter_verse_refs = re.finditer(r'\b(?:(chapters?)\s+(\d+(?:[-–]\d+)?(?:[,;]\s*(?:and\s+|or\s+)?\d+(?:[-–]\d+)?)*(?:\s+(?:and|or)\s+\d+(?:[-–]\d+)?)?)|(verses?)\s+(\d+(?:[-–]\d+)?(?:[,;]\s*(?:and\s+|or\s+)?\d+(?:[-–]\d+)?)*(?:\s+(?:and|or)\s+\d+(?:[-–]\d+)?)?)|(\d+):(\d+(?:[-–]\d+(?::\d+)?)?))\b', original)
+            book_refs = book_pattern.finditer(original)
+            chapter_verse_refs = chapter_verse_pattern.finditer(original)
             
             all_matches = []
             
@@ -109,13 +140,12 @@ def add_verse_codes_to_column(rows, book_code):
             all_matches.sort(key=lambda x: x[1].start())
             
             # Filter out matches that are already inside markdown links
+            # Find all markdown links in the text once per row
+            link_spans = [link_match.span() for link_match in link_pattern.finditer(original)]
+
             def is_inside_markdown_link(text, start, end):
                 """Check if a position range is inside an existing markdown link."""
-                # Find all markdown links in the text
-                link_pattern = r'\[([^\]]+)\]\([^)]+\)'
-                for link_match in re.finditer(link_pattern, text):
-                    link_start = link_match.start()
-                    link_end = link_match.end()
+                for link_start, link_end in link_spans:
                     # Check if our match is completely inside this link
                     if link_start <= start and end <= link_end:
                         return True
@@ -176,11 +206,7 @@ def add_verse_codes_to_column(rows, book_code):
                     references = match.group(2).strip()
                     
                     # Get the book code for this reference
-                    ref_book_code = None
-                    for name, code in usfm_book_codes.items():
-                        if book_name.lower() == name.lower():
-                            ref_book_code = code
-                            break
+                    ref_book_code = book_codes_by_name.get(book_name.lower())
                     
                     if ref_book_code:
                         new_text = process_book_reference(original_text, book_name, references, ref_book_code, current_book, current_chapter, current_verse, single_chapter_books)
@@ -216,6 +242,10 @@ def add_verse_codes_to_column(rows, book_code):
 
         processed.append(row)
 
+        # Callers that only need to know whether anything changes can stop here
+        if stop_at_first_change and changes:
+            break
+
     return processed, changes
 
 
@@ -424,26 +454,179 @@ def create_target_path(target_book, chapter, verse, current_book):
 
 
 
-def process_file(input_file, inplace=False):
-    """Process a single TSV file and return the book code."""
-    # Extract book code from filename (e.g., "tn_GEN.tsv" -> "GEN")
+def run_git(args, cwd):
+    """Run a local git command and return its stdout, raising RuntimeError on failure"""
+    import subprocess
+    try:
+        result = subprocess.run(['git'] + args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True, encoding='utf-8')
+    except OSError as e:
+        raise RuntimeError(f"could not run git: {e}")
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def git_changed_files(directory, since):
+    """Return the (changed, untracked) file names in a directory since the given revision.
+
+    Uses one `git diff --name-only` and one `git ls-files --others` for the
+    whole directory; names are relative to the directory.
+    """
+    changed = run_git(['diff', '--no-ext-diff', '--name-only', '--relative', '-z', since, '--', '.'], directory)
+    untracked = run_git(['ls-files', '--others', '--exclude-standard', '-z', '--', '.'], directory)
+    return set(filter(None, changed.split('\0'))), set(filter(None, untracked.split('\0')))
+
+
+def git_changed_rows(input_file, since):
+    """Return the row indices of input_file changed since the given revision.
+
+    Uses the hunks of the local `git diff` to map changed lines to rows. The
+    indices are physical line numbers, so the file must be read with
+    read_tsv_rows(f, line_based=True) for them to address the right rows.
+    """
+    directory = os.path.dirname(os.path.abspath(input_file))
+    name = os.path.basename(input_file)
+    diff = run_git(['diff', '--no-ext-diff', '--no-color', '-U0', since, '--', name], directory)
+
+    changed_rows = set()
+    for match in re.finditer(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@', diff, re.MULTILINE):
+        start = int(match.group(1))
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        # Line numbers are 1-based; row indices are 0-based
+        changed_rows.update(range(start - 1, start - 1 + count))
+    return changed_rows
+
+
+def read_tsv_rows(f, line_based=False):
+    """Return a csv reader over the rows of an open TSV file.
+
+    With line_based set, quotes are not interpreted, so every physical line is
+    exactly one row; use this whenever rows are addressed by line number.
+    """
+    if line_based:
+        return csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+    return csv.reader(f, delimiter='\t')
+
+
+def get_book_code(input_file):
+    """Get the book code from a filename (e.g., "tn_GEN.tsv" -> "GEN")"""
     basename = os.path.basename(input_file)
     if basename.startswith('tn_') and basename.endswith('.tsv'):
-        book_code = basename[3:-4]  # Remove 'tn_' prefix and '.tsv' suffix
+        return basename[3:-4]  # Remove 'tn_' prefix and '.tsv' suffix
+    # Fallback: use the base filename without extension
+    return os.path.splitext(basename)[0]
+
+
+def check_file(input_file, check_all=False, only_rows=None):
+    """Check a single TSV file without writing anything and return the number of missing links.
+
+    Unless check_all is set, stops at the first row that would change.
+    """
+    book_code = get_book_code(input_file)
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        # Stream the rows so the rest of the file is never read after the first change
+        reader = read_tsv_rows(f, line_based=only_rows is not None)
+        _, changes = add_verse_codes_to_column(reader, book_code, only_rows, stop_at_first_change=not check_all)
+
+    if not changes:
+        print(f"OK {input_file} (book: {book_code})")
+    elif check_all:
+        print(f"MISSING {input_file} (book: {book_code}): {len(changes)} link(s) missing")
     else:
-        # Fallback: use the base filename without extension
-        book_code = os.path.splitext(basename)[0]
+        reference, note_id = changes[0][0], changes[0][1]
+        print(f"MISSING {input_file} (book: {book_code}): links missing at {reference} {note_id}")
+    return len(changes)
+
+
+def write_file_atomically(output_file, lines):
+    """Write an iterable of text lines to output_file through a temporary file renamed into place.
+
+    The temporary file lives in the same directory, so an interrupted run (or an
+    exception raised while producing the lines) never leaves a half-written file.
+    """
+    import tempfile
+    import shutil
+
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    fd, temp_file = tempfile.mkstemp(prefix='.' + os.path.basename(output_file) + '.', suffix='.tmp', dir=output_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+        if os.path.exists(output_file):
+            shutil.copymode(output_file, temp_file)
+        else:
+            # mkstemp creates 0600 files; give new files the mode a plain open() would
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_file, 0o666 & ~umask)
+        os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def encode_output(text):
+    """Return the bytes written for text, matching the newline translation of a text-mode write"""
+    return text.replace('\n', os.linesep).encode('utf-8')
+
+
+def write_file_if_changed(output_file, text):
+    """Atomically write text to output_file, unless the file already has exactly these bytes.
+
+    Returns True if the file was written.
+    """
+    data = encode_output(text)
+    if os.path.exists(output_file):
+        with open(output_file, 'rb') as f:
+            if f.read() == data:
+                return False
+
+    write_file_atomically(output_file, [text])
+    return True
+
+
+def process_file(input_file, inplace=False, only_rows=None, write_empty_diff=False, patch=False, append_diff=False,
+                 before_write_output=None):
+    """Process a single TSV file and return (book code, diff file path, number of changes).
+
+    If only_rows is given, only the rows with those indices are linked.
+    If patch is set, a _patch file listing only the changed rows is written
+    instead of the full converted file.
+    Output files are only replaced when their contents change, and the diff
+    file is skipped when there are no changes unless write_empty_diff is set.
+    If append_diff is set, new changes are added to the existing diff file
+    instead of replacing it.
+    If given, before_write_output is called with the output bytes and the
+    number of changes before any file is written, so a run can be checkpointed
+    (or abandoned by raising) before the TSV is replaced. The diff file is
+    written before the output file.
+    """
+    book_code = get_book_code(input_file)
     
     print(f"Processing {input_file} (book: {book_code})")
     
     with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f, delimiter='\t')
+        # Patches and row subsets address physical lines, so quotes must not join lines into one row
+        reader = read_tsv_rows(f, line_based=patch or only_rows is not None)
         rows = list(reader)
 
-    processed, changes = add_verse_codes_to_column(rows, book_code)
+    # Rows are updated in place, so keep the original notes to find the changed rows
+    original_notes = [row[6] if len(row) > 6 else None for row in rows]
+    processed, changes = add_verse_codes_to_column(rows, book_code, only_rows)
     input_base, input_ext = os.path.splitext(input_file)
 
-    if inplace:
+    if patch:
+        # Write only the changed rows as (line number, ID, new Note)
+        output_file = f"{input_base}_patch{input_ext}"
+        patch_rows = [[str(i + 1), row[1], row[6]] for i, row in enumerate(processed)
+                      if original_notes[i] is not None and row[6] != original_notes[i]]
+        output_text = '\t'.join(["Line", "ID", "Note"]) + '\n'
+        output_text += ''.join('\t'.join(row) + '\n' for row in patch_rows)
+    elif inplace:
         # Overwrite the original file
         output_file = input_file
     else:
@@ -451,67 +634,618 @@ def process_file(input_file, inplace=False):
         # Create output filename by inserting "_converted" before the extension
         output_file = f"{input_base}_converted{input_ext}"
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for i, row in enumerate(processed):
-            f.write('\t'.join(row))
-            f.write('\n')
+    if not patch:
+        output_text = ''.join('\t'.join(row) + '\n' for row in processed)
+
+    if before_write_output:
+        before_write_output(encode_output(output_text), len(changes))
 
-    # Write changes to a diff file
+    # Write changes to a diff file first, so it is never older than an in-place output
     changes_file = f"{input_base}_diff{input_ext}"
-    with open(changes_file, 'w', encoding='utf-8') as f:
-        f.write('\t'.join(["Reference", "ID", "Original", "Replaced"]) + '\n')
-        for row in changes:
-            f.write('\t'.join(row) + '\n')
+    previous_changes = ''
+    if append_diff and os.path.exists(changes_file):
+        with open(changes_file, 'r', encoding='utf-8') as f:
+            previous_changes = ''.join(f.readlines()[1:])
+    if changes or previous_changes or write_empty_diff:
+        diff_text = '\t'.join(["Reference", "ID", "Original", "Replaced"]) + '\n'
+        diff_text += previous_changes
+        diff_text += ''.join('\t'.join(row) + '\n' for row in changes)
+        diff_written = write_file_if_changed(changes_file, diff_text)
+    else:
+        # Don't leave a stale diff from an earlier run next to an unchanged file
+        if os.path.exists(changes_file):
+            os.remove(changes_file)
+        diff_written = None
+
+    output_written = write_file_if_changed(output_file, output_text)
     
-    print(f"  Converted file: {output_file}")
-    print(f"  Changes logged: {changes_file}")
+    print(f"  {'Patch' if patch else 'Converted'} file: {output_file}{'' if output_written else ' (unchanged)'}")
+    if diff_written is None:
+        print("  Changes logged: none")
+    else:
+        print(f"  Changes logged: {changes_file}{'' if diff_written else ' (unchanged)'}")
     print(f"  Total changes: {len(changes)}")
-    return book_code
+    return book_code, changes_file, len(changes)
+
+
+def apply_patch(patch_file):
+    """Apply a _patch file to its original TSV file in one streaming pass.
+
+    Each patched line must still have the ID recorded in the patch, otherwise
+    the patch is refused and the original file is left untouched.
+    Returns the path of the patched file.
+    """
+    patch_base, patch_ext = os.path.splitext(patch_file)
+    if not patch_base.endswith('_patch'):
+        raise ValueError(f"{patch_file} is not a _patch file")
+    target_file = patch_base[:-len('_patch')] + patch_ext
+
+    patch_rows = {}
+    with open(patch_file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+        for row in list(reader)[1:]:
+            if len(row) < 3:
+                continue
+            patch_rows[int(row[0])] = (row[1], row[2])
+
+    if not patch_rows:
+        print(f"Nothing to apply to {target_file} from {patch_file}")
+        return target_file
+
+    def patched_lines():
+        applied = 0
+        with open(target_file, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if line_number in patch_rows:
+                    note_id, note = patch_rows[line_number]
+                    columns = line.rstrip('\n').split('\t')
+                    if len(columns) < 7 or columns[1] != note_id:
+                        found_id = columns[1] if len(columns) > 1 else ''
+                        raise ValueError(f"{target_file} line {line_number} has ID '{found_id}', expected '{note_id}'; refusing to apply patch")
+                    columns[6] = note
+                    line = '\t'.join(columns) + '\n'
+                    applied += 1
+                yield line
+        if applied != len(patch_rows):
+            raise ValueError(f"{target_file} is shorter than the patch expects; refusing to apply patch")
+
+    write_file_atomically(target_file, patched_lines())
+    print(f"Patched {target_file}: {len(patch_rows)} row(s) from {patch_file}")
+    return target_file
+
+
+def parse_positive_float(value):
+    """Parse a command line number that must be greater than zero"""
+    import argparse
+
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number '{value}'")
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"'{value}' must be greater than 0")
+    return number
+
+
+def parse_shard(value):
+    """Parse a '--shard K/N' value into a (K, N) tuple with 1 <= K <= N"""
+    import argparse
+
+    match = re.match(r'^\s*(\d+)\s*/\s*(\d+)\s*$', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected K/N (e.g. 1/4)")
+    shard_index, shard_count = int(match.group(1)), int(match.group(2))
+    if shard_count < 1 or not 1 <= shard_index <= shard_count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', K must be between 1 and N")
+    return shard_index, shard_count
+
+
+def count_lines(input_file):
+    """Return the number of lines in a file"""
+    with open(input_file, 'rb') as f:
+        return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 16), b''))
+
+
+def shard_files(input_files, shard_index, shard_count):
+    """Return the files assigned to shard K of N, balancing shards by total line count.
+
+    Files are assigned largest first to the currently lightest shard, with ties
+    broken by file name and shard number, so every node computes the same split.
+    Line counts are used rather than byte sizes because linking (e.g. with -i)
+    grows the files but never adds lines, so workers starting later still agree.
+    """
+    sized_files = sorted(((count_lines(f), os.path.basename(f), f) for f in input_files),
+                         key=lambda item: (-item[0], item[1], item[2]))
+    shard_sizes = [0] * shard_count
+    assigned = [[] for _ in range(shard_count)]
+    for size, _, input_file in sized_files:
+        target = min(range(shard_count), key=lambda k: (shard_sizes[k], k))
+        shard_sizes[target] += size
+        assigned[target].append(input_file)
+    # Keep the original (sorted) processing order within the shard
+    selected = set(assigned[shard_index - 1])
+    return [f for f in input_files if f in selected]
+
+
+def write_summary(summary_file, results):
+    """Write a per-run summary TSV listing each processed book, its diff file and change count"""
+    summary_dir = os.path.dirname(os.path.abspath(summary_file))
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(["Book", "Diff", "Changes"]) + '\n')
+        for book_code, changes_file, change_count in results:
+            # Store diff paths relative to the summary so shard artifacts can be moved together
+            diff_path = os.path.relpath(os.path.abspath(changes_file), summary_dir)
+            f.write('\t'.join([book_code, diff_path, str(change_count)]) + '\n')
+
+
+def merge_summaries(summary_files, report_file):
+    """Combine per-shard summaries and their diff files into a single report TSV.
+
+    Raises ValueError if a summary file is missing or malformed.
+    """
+    books = []
+    for summary_file in summary_files:
+        summary_dir = os.path.dirname(os.path.abspath(summary_file))
+        try:
+            with open(summary_file, 'r', encoding='utf-8') as f:
+                rows = list(csv.reader(f, delimiter='\t'))
+        except OSError as e:
+            raise ValueError(f"could not read summary file {summary_file}: {e.strerror}")
+        for line_number, row in enumerate(rows[1:], 2):
+            if len(row) < 3:
+                continue
+            book_code, diff_path, change_count = row[0], row[1], row[2]
+            if not change_count.isdigit():
+                raise ValueError(f"{summary_file} line {line_number}: invalid Changes value '{change_count}'")
+            books.append((book_code, os.path.join(summary_dir, diff_path), int(change_count)))
+
+    books.sort(key=lambda item: (item[0], item[1]))
+    total_changes = 0
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(["Book", "Reference", "ID", "Original", "Replaced"]) + '\n')
+        for book_code, diff_file, change_count in books:
+            total_changes += change_count
+            if not os.path.exists(diff_file):
+                if change_count == 0:
+                    continue  # Empty diff files are not written
+                print(f"Warning: Diff file {diff_file} for {book_code} does not exist, skipping")
+                continue
+            with open(diff_file, 'r', encoding='utf-8') as diff:
+                diff_rows = list(csv.reader(diff, delimiter='\t'))
+            for diff_row in diff_rows[1:]:
+                f.write('\t'.join([book_code] + diff_row) + '\n')
+
+    print(f"Merged {len(books)} book(s) from {len(summary_files)} summary file(s)")
+    for book_code, _, change_count in books:
+        print(f"  {book_code}: {change_count} change(s)")
+    print(f"  Report: {report_file}")
+    print(f"  Total changes: {total_changes}")
+
+
+def hash_bytes(data):
+    """Return the SHA-256 hex digest of some bytes"""
+    import hashlib
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(input_file):
+    """Return the SHA-256 hex digest of a file's contents"""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_journal(journal_file):
+    """Read a checkpoint journal into a dict of (path, mode) -> {input hash: change count}.
+
+    Each journal line is 'path<TAB>mode<TAB>sha256<TAB>changes', recorded when a
+    book completes. Incomplete or malformed lines (e.g. from a killed process)
+    are ignored.
+    """
+    completed = {}
+    if not os.path.exists(journal_file):
+        return completed
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                continue
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) != 4 or not parts[3].isdigit():
+                continue
+            path, mode, digest, change_count = parts
+            completed.setdefault((path, mode), {})[digest] = int(change_count)
+    return completed
+
+
+def journaled_outputs(input_file, mode, change_count):
+    """Return the output files a book completed in this mode must have left behind"""
+    input_base, input_ext = os.path.splitext(input_file)
+    outputs = [f"{input_base}_{mode}{input_ext}"] if mode in ('converted', 'patch') else []
+    if change_count:
+        outputs.append(f"{input_base}_diff{input_ext}")
+    return outputs
+
+
+def append_journal(journal_file, input_file, mode, digest, change_count):
+    """Append a completed book to the checkpoint journal.
+
+    The line is written with a single O_APPEND write (under an exclusive lock
+    where available), so several worker processes can share one journal.
+    """
+    try:
+        import fcntl
+    except ImportError:  # Not available on Windows
+        fcntl = None
+
+    line = '\t'.join([os.path.abspath(input_file), mode, digest, str(change_count)]) + '\n'
+    fd = os.open(journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        os.write(fd, line.encode('utf-8'))
+        os.fsync(fd)
+    finally:
+        os.close(fd)  # Also releases the lock
+
+
+def discard_partial_outputs(input_file, max_age=300):
+    """Remove temporary output files left behind by an interrupted run on this book.
+
+    Only temp files untouched for max_age seconds are removed, so a temp file
+    another live worker is still writing for the same book is left alone.
+    """
+    import time
+
+    input_base, input_ext = os.path.splitext(input_file)
+    directory = os.path.dirname(os.path.abspath(input_file))
+    for output_file in [input_file] + [f"{input_base}{suffix}{input_ext}" for suffix in ('_converted', '_diff', '_patch')]:
+        pattern = os.path.join(directory, glob.escape('.' + os.path.basename(output_file)) + '.*.tmp')
+        for temp_file in glob.glob(pattern):
+            try:
+                if time.time() - os.path.getmtime(temp_file) < max_age:
+                    continue
+            except OSError:
+                continue  # Already renamed into place or removed
+            print(f"  Discarding partial output {temp_file}")
+            os.remove(temp_file)
+
+
+def find_input_files(paths, warn=True):
+    """Expand the given files and directories into the list of TSV files to process"""
+    input_files = []
+    for arg in paths:
+        if os.path.isdir(arg):
+            # If it's a directory, find all tn_???.tsv files in it
+            pattern = os.path.join(arg, 'tn_???.tsv')
+            input_files.extend(sorted(glob.glob(pattern)))
+        elif os.path.isfile(arg):
+            # If it's a file, add it directly
+            input_files.append(arg)
+        elif warn:
+            print(f"Warning: {arg} is not a valid file or directory")
+    return input_files
+
+
+def row_fingerprints(f):
+    """Return an (ID, Note hash) fingerprint for each line of an open TSV file"""
+    import hashlib
+    return [(row[1] if len(row) > 1 else '',
+             hashlib.sha1((row[6] if len(row) > 6 else '').encode('utf-8')).hexdigest())
+            for row in read_tsv_rows(f, line_based=True)]
+
+
+def read_row_fingerprints(input_file):
+    """Return an (ID, Note hash) fingerprint for each line of a TSV file"""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return row_fingerprints(f)
+
+
+def get_stat_key(input_file):
+    """Return the (mtime, size) pair used to detect that a file was saved"""
+    stat = os.stat(input_file)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileChangedError(Exception):
+    """Raised when a watched file is saved again while it is being relinked"""
+
+
+def relink_file(input_file, stat_key, only_rows=None, write_empty_diff=False):
+    """Relink a watched file in place and return its new (stat key, row fingerprints) entry.
+
+    Raises FileChangedError, without writing anything, if the file no longer
+    has stat_key when the outputs are about to be written. If the file is
+    saved again right after the replace, the returned stat key is None so the
+    next poll treats that save as a change against what was written.
+    """
+    import io
+
+    written = []
+
+    def check_unchanged(data, change_count):
+        if get_stat_key(input_file) != stat_key:
+            raise FileChangedError(f"{input_file} was saved again while it was being relinked")
+        written.append(data)
+
+    process_file(input_file, True, only_rows, write_empty_diff, append_diff=True, before_write_output=check_unchanged)
+
+    data = written[0]
+    fingerprints = set(row_fingerprints(io.StringIO(data.decode('utf-8')))[1:])
+    new_stat_key = get_stat_key(input_file)
+    with open(input_file, 'rb') as f:
+        if f.read() == data and get_stat_key(input_file) == new_stat_key:
+            return new_stat_key, fingerprints
+    return None, fingerprints
+
+
+def watch_files(paths, interval=1.0, debounce=0.5, write_empty_diff=False):
+    """Poll the given files and directories and relink the rows that change on each save.
+
+    Files are modified in place. Each file is linked in full once when the
+    watch starts; after that a save is only processed once the file's stat has
+    been stable for the debounce period. Changed rows are the ones whose
+    (ID, Note hash) was not in the file before the save; only those rows are
+    relinked, and their changes are added to the existing diff file.
+    """
+    import time
+
+    known = {}    # file -> (stat key, set of row fingerprints)
+    pending = {}  # file -> (stat key, time the change was first seen)
+    for input_file in find_input_files(paths):
+        try:
+            known[input_file] = relink_file(input_file, get_stat_key(input_file), None, write_empty_diff)
+        except FileChangedError as e:
+            # Not known yet, so the next poll relinks the whole file
+            print(f"  {e}; relinking after it settles")
+        except Exception as e:
+            print(f"Error processing {input_file}: {e}")
+
+    print(f"Watching {len(known)} file(s), polling every {interval}s (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            for input_file in find_input_files(paths, warn=False):
+                try:
+                    stat_key = get_stat_key(input_file)
+                except OSError:
+                    continue  # Removed (or being replaced) between listing and stat
+
+                if input_file in known and known[input_file][0] == stat_key:
+                    pending.pop(input_file, None)
+                    continue
+                if input_file not in pending or pending[input_file][0] != stat_key:
+                    # New change: wait for the file to settle before relinking
+                    pending[input_file] = (stat_key, time.time())
+                    continue
+                if time.time() - pending[input_file][1] < debounce:
+                    continue
+                del pending[input_file]
+
+                try:
+                    fingerprints = read_row_fingerprints(input_file)
+                    previous = known[input_file][1] if input_file in known else set()
+                    changed = {i for i, fingerprint in enumerate(fingerprints)
+                               if i > 0 and fingerprint not in previous}
+                    if changed:
+                        start = time.perf_counter()
+                        saved_at = stat_key[0] / 1e9
+                        known[input_file] = relink_file(input_file, stat_key, changed, write_empty_diff)
+                        elapsed = time.perf_counter() - start
+                        since_save = time.time() - saved_at
+                        print(f"  Relinked {len(changed)} changed row(s) in {elapsed * 1000:.0f} ms "
+                              f"({since_save * 1000:.0f} ms after save)")
+                    else:
+                        known[input_file] = (stat_key, set(fingerprints[1:]))
+                except FileChangedError as e:
+                    # Leave the known entry alone so the new save is picked up on the next poll
+                    print(f"  {e}; relinking after it settles")
+                except Exception as e:
+                    print(f"Error processing {input_file}: {e}")
+    except KeyboardInterrupt:
+        print("Stopped watching")
 
 
 def main():
+    import argparse
+
     # Handle command line arguments
     parser = argparse.ArgumentParser(description='Process TSV files to add verse links')
     parser.add_argument('-i', '--inplace', action='store_true', 
                        help='Modify files in place instead of creating _converted versions')
+    parser.add_argument('--write-empty-diff', action='store_true',
+                       help='Write the _diff file even when a file has no changes')
+    parser.add_argument('--patch', action='store_true',
+                       help='Write a _patch file listing only the changed rows instead of the full converted file')
+    parser.add_argument('--apply-patch', action='store_true',
+                       help='Apply the given _patch files (or the tn_???_patch.tsv files in the given directories) to their original files')
+    parser.add_argument('--watch', action='store_true',
+                       help='With -i, keep polling the files and relink the rows that change whenever a file is saved')
+    parser.add_argument('--interval', type=parse_positive_float, default=1.0, metavar='SECONDS',
+                       help='With --watch, how often to poll the files (default: 1.0)')
+    parser.add_argument('--debounce', type=parse_positive_float, default=0.5, metavar='SECONDS',
+                       help='With --watch, how long a file must be unchanged before it is relinked (default: 0.5)')
+    parser.add_argument('--shard', type=parse_shard, metavar='K/N',
+                       help='Only process shard K of N, splitting the files into N shards balanced by line count')
+    parser.add_argument('--summary', metavar='FILE',
+                       help='Write a TSV summary of the processed books and their diff files to FILE')
+    parser.add_argument('--merge', metavar='REPORT',
+                       help='Merge the summary files given as arguments (and their diff files) into REPORT instead of processing')
+    parser.add_argument('--journal', metavar='FILE',
+                       help='Append each completed book and its input hash to the checkpoint journal FILE')
+    parser.add_argument('--resume', action='store_true',
+                       help='With --journal, skip books already completed with unchanged inputs')
+    parser.add_argument('--since', metavar='REV',
+                       help='Only process files (and rows) changed in the local git repository since revision REV')
+    parser.add_argument('--check', action='store_true',
+                       help='Only check for missing links without writing any files; exits non-zero if links are missing')
+    parser.add_argument('--all', action='store_true',
+                       help='With --check, count every missing link instead of stopping at the first row that would change')
     parser.add_argument('files', nargs='*', 
                        help='Files or directories to process. If a directory, all tn_???.tsv files will be processed. Can be a reatlive path.')
     args = parser.parse_args()
+
+    # --check promises not to write anything
+    if args.check and (args.merge or args.apply_patch):
+        parser.error('--check cannot be used with --merge or --apply-patch')
     
-    inplace = args.inplace
-    if len(sys.argv) > 1:
-        # Use provided file(s) as arguments
-        input_files = []
-        for arg in sys.argv[1:]:
+    if args.merge:
+        if not args.files:
+            parser.error('--merge requires at least one summary file')
+        try:
+            merge_summaries(args.files, args.merge)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        return
+
+    if args.all and not args.check:
+        parser.error('--all can only be used with --check')
+    if args.resume and not args.journal:
+        parser.error('--resume requires --journal')
+    if args.patch and args.inplace:
+        parser.error('--patch cannot be used with --inplace')
+
+    if args.apply_patch:
+        patch_files = []
+        for arg in args.files:
             if os.path.isdir(arg):
-                # If it's a directory, find all tn_???.tsv files in it
-                pattern = os.path.join(arg, 'tn_???.tsv')
-                input_files.extend(sorted(glob.glob(pattern)))
-            elif os.path.isfile(arg):
-               # If it's a file, add it directly
-                input_files.append(arg)
+                patch_files.extend(sorted(glob.glob(os.path.join(arg, 'tn_???_patch.tsv'))))
             else:
-                print(f"Warning: {arg} is not a valid file or directory")
+                patch_files.append(arg)
+        failed_patches = 0
+        for patch_file in patch_files:
+            try:
+                apply_patch(patch_file)
+            except Exception as e:
+                print(f"Error applying {patch_file}: {e}")
+                failed_patches += 1
+        if failed_patches:
+            sys.exit(2)
+        return
+
+    inplace = args.inplace
+    if args.watch:
+        if not inplace:
+            parser.error('--watch requires --inplace')
+        if args.check or args.since or args.shard or args.journal or args.summary:
+            parser.error('--watch cannot be used with --check, --since, --shard, --journal or --summary')
+        watch_files(args.files or ['.'], args.interval, args.debounce, args.write_empty_diff)
+        return
+
+    invalid_paths = []
+    if args.files:
+        # Use provided file(s) as arguments
+        input_files = find_input_files(args.files)
+        invalid_paths = [arg for arg in args.files if not os.path.isdir(arg) and not os.path.isfile(arg)]
     else:
         # Find all .tsv files in current directory
         input_files = sorted(glob.glob('tn_???.tsv'))
         if not input_files:
             print("No .tsv files found in current directory")
+            if args.check:
+                sys.exit(2)
             return
+
+    if args.check and not input_files:
+        # A mistyped path or an empty directory must not pass as "fully linked"
+        print("Error: No tn_???.tsv files found to check")
+        sys.exit(2)
     
+    changed_rows = {}
+    if args.since:
+        try:
+            # Ask git once per directory, then only diff the files that changed
+            changed_by_directory = {}
+            for input_file in input_files:
+                if not os.path.exists(input_file):
+                    continue
+                directory = os.path.dirname(os.path.abspath(input_file))
+                if directory not in changed_by_directory:
+                    changed_by_directory[directory] = git_changed_files(directory, args.since)
+                changed, untracked = changed_by_directory[directory]
+                name = os.path.basename(input_file)
+                if name in untracked:
+                    changed_rows[input_file] = None  # Untracked files are processed in full
+                elif name in changed:
+                    rows = git_changed_rows(input_file, args.since)
+                    if rows:
+                        changed_rows[input_file] = rows
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        input_files = [f for f in input_files if f in changed_rows]
+        print(f"Changed since {args.since}: {len(input_files)} file(s)")
+
+    if args.shard:
+        shard_index, shard_count = args.shard
+        input_files = shard_files([f for f in input_files if os.path.exists(f)], shard_index, shard_count)
+        print(f"Shard {shard_index}/{shard_count}")
+
     print(f"Found {len(input_files)} file(s) to process")
+
+    if args.check:
+        missing_links = 0
+        failed_files = len(invalid_paths)
+        for input_file in input_files:
+            if not os.path.exists(input_file):
+                print(f"Error: File {input_file} does not exist")
+                failed_files += 1
+                continue
+
+            try:
+                missing_links += check_file(input_file, args.all, changed_rows.get(input_file))
+            except Exception as e:
+                print(f"Error checking {input_file}: {e}")
+                failed_files += 1
+        if failed_files:
+            sys.exit(2)
+        sys.exit(1 if missing_links else 0)
     
+    completed = read_journal(args.journal) if args.resume else {}
+    mode = 'patch' if args.patch else 'inplace' if inplace else 'converted'
+
+    results = []
     for input_file in input_files:
         if not os.path.exists(input_file):
             print(f"Warning: File {input_file} does not exist, skipping")
             continue
         
         try:
-            process_file(input_file, inplace)
+            if args.journal:
+                done = completed.get((os.path.abspath(input_file), mode), {})
+                digest = hash_file(input_file)
+                if digest in done and all(os.path.exists(output) for output in journaled_outputs(input_file, mode, done[digest])):
+                    print(f"Skipping {input_file} (already completed with unchanged input)")
+                    input_base, input_ext = os.path.splitext(input_file)
+                    results.append((get_book_code(input_file), f"{input_base}_diff{input_ext}", done[digest]))
+                    continue
+                discard_partial_outputs(input_file)
+
+            # Only journal complete books, not the changed-rows subsets of --since
+            journal_book = args.journal and changed_rows.get(input_file) is None
+
+            def journal_output(data, change_count, input_file=input_file):
+                # In place, journal the TSV we are about to write: if the run is killed
+                # after the replace, the resumed run sees this hash and keeps the diff
+                append_journal(args.journal, input_file, mode, hash_bytes(data), change_count)
+
+            result = process_file(input_file, inplace, changed_rows.get(input_file), args.write_empty_diff, args.patch,
+                                  before_write_output=journal_output if journal_book and inplace else None)
+            results.append(result)
+
+            if journal_book and not inplace:
+                append_journal(args.journal, input_file, mode, hash_file(input_file), result[2])
         except Exception as e:
             print(f"Error processing {input_file}: {e}")
             continue
 
+    if args.summary:
+        write_summary(args.summary, results)
+        print(f"Summary written: {args.summary}")
+
 
 if __name__ == "__main__":
     main()
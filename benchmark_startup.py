@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Translation Notes Scripture Links Tool.
+
+Measures, in fresh Python processes, the time from importing
+add_scripture_links to the first linked row, which dominates short
+single-book and editor hook invocations.
+"""
+
+import sys
+import subprocess
+import statistics
+
+RUNS = 20
+
+# Runs in a fresh interpreter so the import is not already cached
+CHILD_CODE = '''
+import time
+start = time.perf_counter()
+import add_scripture_links
+imported = time.perf_counter()
+rows = [
+    ["Reference", "ID", "Tags", "SupportReference", "Quote", "Occurrence", "Note"],
+    ["1:1", "abc1", "", "", "Jesus", "1", "See Genesis 22:18 and verses 4-6."],
+]
+add_scripture_links.add_verse_codes_to_column(rows, "MAT")
+linked = time.perf_counter()
+print(imported - start, linked - imported)
+'''
+
+
+def run_once():
+    """Run the child process once and return (import time, first row time) in seconds."""
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    import_time, first_row_time = result.stdout.split()
+    return float(import_time), float(first_row_time)
+
+
+def main():
+    """Main function."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    import_times = []
+    first_row_times = []
+    for _ in range(runs):
+        import_time, first_row_time = run_once()
+        import_times.append(import_time * 1000)
+        first_row_times.append(first_row_time * 1000)
+    totals = [a + b for a, b in zip(import_times, first_row_times)]
+
+    print(f"Startup benchmark ({runs} runs, milliseconds)")
+    print(f"  {'':<20} {'min':>8} {'median':>8}")
+    for label, times in [("Import", import_times), ("First linked row", first_row_times), ("Total", totals)]:
+        print(f"  {label:<20} {min(times):8.2f} {statistics.median(times):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
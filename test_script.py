@@ -11,6 +11,10 @@ import sys
 import subprocess
 import csv
 import difflib
+import shutil
+import tempfile
+import time
+import signal
 from pathlib import Path
 
 # Test configuration
@@ -161,6 +165,128 @@ def run_script_on_test_cases(test_result):
         return False
 
 
+def run_script(args, cwd=None):
+    """Run add_scripture_links.py with the given arguments and return the completed process."""
+    return subprocess.run(
+        [sys.executable, str(Path(SCRIPT_NAME).resolve())] + [str(arg) for arg in args],
+        capture_output=True,
+        text=True,
+        cwd=cwd
+    )
+
+
+def run_python(code, cwd=None):
+    """Run Python code in a fresh interpreter that can import add_scripture_links."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(Path.cwd()), env.get('PYTHONPATH')]))
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=cwd, env=env)
+
+
+def copy_test_inputs(directory):
+    """Copy the test case input files into a scratch directory."""
+    for book in TEST_BOOKS:
+        shutil.copy(Path(TEST_DIR) / f"tn_{book}.tsv", directory)
+
+
+def check_shard_and_merge(test_result):
+    """Check that shards are disjoint and complete and that merging them gives one report."""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_test_inputs(tmp)
+        shard_count = 2
+        processed = []
+        for shard_index in range(1, shard_count + 1):
+            result = run_script(['--shard', f"{shard_index}/{shard_count}",
+                                 '--summary', f"shard{shard_index}.tsv", '.'], cwd=tmp)
+            if result.returncode != 0:
+                test_result.add_fail(f"Shard {shard_index}/{shard_count} run failed", result.stdout + result.stderr)
+                return
+            summary = read_tsv_file(Path(tmp) / f"shard{shard_index}.tsv")
+            processed.extend(row[0] for row in summary[1:])
+
+        if sorted(processed) != sorted(TEST_BOOKS):
+            test_result.add_fail("Shards are not disjoint and complete", f"Processed books: {processed}")
+            return
+        test_result.add_pass("Shards are disjoint and complete")
+
+        result = run_script(['--merge', 'report.tsv'] + [f"shard{k}.tsv" for k in range(1, shard_count + 1)], cwd=tmp)
+        report = read_tsv_file(Path(tmp) / "report.tsv")
+        expected_report = [["Book", "Reference", "ID", "Original", "Replaced"]]
+        for book in sorted(TEST_BOOKS):
+            expected_diff = read_tsv_file(Path(TEST_DIR) / f"tn_{book}_expected_diff.tsv")
+            expected_report.extend([book] + row for row in expected_diff[1:])
+        if result.returncode != 0 or report != expected_report:
+            test_result.add_fail("Merged shard report does not match the expected diffs", result.stdout + result.stderr)
+            return
+        test_result.add_pass("Merged shard report matches the expected diffs")
+
+    # Shards must agree even when an earlier shard already linked its files in place
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_test_inputs(tmp)
+        shutil.copy(Path(TEST_DIR) / "tn_MAT.tsv", Path(tmp) / "tn_LUK.tsv")
+        processed = []
+        for shard_index in (2, 1):
+            result = run_script(['-i', '--shard', f"{shard_index}/2", '.'], cwd=tmp)
+            processed.extend(line.split('(book: ')[1].rstrip(')') for line in result.stdout.splitlines()
+                             if line.startswith('Processing '))
+        if sorted(processed) != sorted(TEST_BOOKS + ['LUK']):
+            test_result.add_fail("In-place shards overlap or miss books", f"Processed books: {processed}")
+        else:
+            test_result.add_pass("In-place shards stay disjoint and complete")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bad_summary = Path(tmp) / "bad.tsv"
+        bad_summary.write_text("Book\tDiff\tChanges\nMAT\ttn_MAT_diff.tsv\tmany\n", encoding='utf-8')
+        missing = run_script(['--merge', 'report.tsv', 'nosuch.tsv'], cwd=tmp)
+        malformed = run_script(['--merge', 'report.tsv', bad_summary], cwd=tmp)
+        if (missing.returncode != 2 or malformed.returncode != 2
+                or 'Traceback' in missing.stderr + malformed.stderr):
+            test_result.add_fail("--merge with a missing or malformed summary should exit 2 without a traceback",
+                                 missing.stdout + missing.stderr + malformed.stdout + malformed.stderr)
+        else:
+            test_result.add_pass("--merge reports missing and malformed summaries")
+
+
+def check_since_mode(test_result):
+    """Check that --since only relinks the rows changed since a git revision."""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_test_inputs(tmp)
+
+        # A note starting with an unclosed quote must not shift the rows git reports
+        mat_file = Path(tmp) / "tn_MAT.tsv"
+        mat_file.write_bytes(mat_file.read_bytes().replace(b"This genealogy", b'"This genealogy'))
+
+        def git(*args):
+            subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                           cwd=tmp, check=True, capture_output=True)
+
+        git('init', '-q')
+        git('add', '.')
+        git('commit', '-q', '-m', 'Initial test cases')
+
+        # Change one row of MAT and leave the other books untouched
+        mat_file.write_bytes(mat_file.read_bytes().replace(b"Micah 5:2", b"Micah 5:3"))
+        lines = [line.split('\t') for line in mat_file.read_text(encoding='utf-8').splitlines()]
+
+        result = run_script(['--since', 'HEAD', '.'], cwd=tmp)
+        converted_file = Path(tmp) / "tn_MAT_converted.tsv"
+        converted = [line.split('\t') for line in converted_file.read_text(encoding='utf-8').splitlines()] if converted_file.exists() else None
+        expected = read_tsv_file(Path(TEST_DIR) / "tn_MAT_expected.tsv")
+        other_books = [book for book in TEST_BOOKS if book != 'MAT']
+        if (result.returncode != 0 or converted is None
+                or converted[1:3] != lines[1:3]
+                or converted[3][6] != expected[3][6].replace("Micah 5:2](../../mic/05/02.md)", "Micah 5:3](../../mic/05/03.md)")
+                or any((Path(tmp) / f"tn_{book}_converted.tsv").exists() for book in other_books)):
+            test_result.add_fail("--since did not relink only the changed row", result.stdout + result.stderr)
+        else:
+            test_result.add_pass("--since relinks only the changed row")
+
+        result = run_script(['--check', '--since', 'no-such-revision', '.'], cwd=tmp)
+        if result.returncode != 2:
+            test_result.add_fail("--since with a bad revision should exit 2", f"Exit code {result.returncode}")
+        else:
+            test_result.add_pass("--since with a bad revision exits 2")
+
+
 def check_test_files(test_result):
     """Check that all required test files exist."""
     missing_files = []
@@ -188,6 +314,323 @@ def check_test_files(test_result):
     return True
 
 
+def check_skip_unchanged_outputs(test_result):
+    """Check that new outputs honour the umask, unchanged files are not rewritten and empty diffs are skipped."""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_test_inputs(tmp)
+        run_script(['.'], cwd=tmp)
+
+        umask = os.umask(0)
+        os.umask(umask)
+        converted_file = Path(tmp) / "tn_MAT_converted.tsv"
+        mode = converted_file.stat().st_mode & 0o777
+        if mode != 0o666 & ~umask:
+            test_result.add_fail("New output file ignores the umask", f"Mode {oct(mode)}, expected {oct(0o666 & ~umask)}")
+        else:
+            test_result.add_pass("New output files honour the umask")
+
+        # Age the outputs so a rewrite would be visible in the modification time
+        old_time = converted_file.stat().st_mtime - 100
+        os.utime(converted_file, (old_time, old_time))
+        run_script(['.'], cwd=tmp)
+        if converted_file.stat().st_mtime != old_time:
+            test_result.add_fail("Unchanged converted file was rewritten")
+        else:
+            test_result.add_pass("Unchanged converted file keeps its modification time")
+
+        # An already linked file has no changes, so no diff file is written
+        linked_dir = Path(tmp) / "linked"
+        linked_dir.mkdir()
+        shutil.copy(Path(TEST_DIR) / "tn_MAT_expected.tsv", linked_dir / "tn_MAT.tsv")
+        run_script(['-i', str(linked_dir)], cwd=tmp)
+        if (linked_dir / "tn_MAT_diff.tsv").exists():
+            test_result.add_fail("Empty diff file was written")
+        else:
+            test_result.add_pass("Empty diff file is skipped")
+
+
+def check_patch_and_apply(test_result):
+    """Check that applying a patch gives the full conversion and that drifted files are refused."""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_test_inputs(tmp)
+        run_script(['--patch', '.'], cwd=tmp)
+        result = run_script(['--apply-patch', '.'], cwd=tmp)
+        mismatched = [book for book in TEST_BOOKS
+                      if read_tsv_file(Path(tmp) / f"tn_{book}.tsv") != read_tsv_file(Path(TEST_DIR) / f"tn_{book}_expected.tsv")]
+        if result.returncode != 0 or mismatched:
+            test_result.add_fail("Applied patches do not match the full conversion", f"Books: {mismatched}")
+        else:
+            test_result.add_pass("Applied patches match the full conversion")
+
+        # An already linked file gives an empty patch, which must not touch the file
+        mat_file = Path(tmp) / "tn_MAT.tsv"
+        run_script(['--patch', str(mat_file)], cwd=tmp)
+        old_time = mat_file.stat().st_mtime - 100
+        os.utime(mat_file, (old_time, old_time))
+        run_script(['--apply-patch', Path(tmp) / "tn_MAT_patch.tsv"], cwd=tmp)
+        if mat_file.stat().st_mtime != old_time:
+            test_result.add_fail("Empty patch rewrote the target file")
+        else:
+            test_result.add_pass("Empty patch leaves the target file untouched")
+
+        # Patch the original again, then change an ID so the patch no longer fits
+        jud_file = Path(tmp) / "tn_JUD.tsv"
+        shutil.copy(Path(TEST_DIR) / "tn_JUD.tsv", jud_file)
+        run_script(['--patch', jud_file], cwd=tmp)
+        drifted = jud_file.read_bytes().replace(b"abc2", b"xyz9")
+        jud_file.write_bytes(drifted)
+        result = run_script(['--apply-patch', Path(tmp) / "tn_JUD_patch.tsv"], cwd=tmp)
+        if ("refusing to apply patch" not in result.stdout or result.returncode != 2
+                or jud_file.read_bytes() != drifted):
+            test_result.add_fail("Patch was applied to a drifted file", result.stdout)
+        else:
+            test_result.add_pass("Patch is refused on ID drift")
+
+        result = run_script(['--apply-patch', Path(tmp) / "tn_GEN_patch.tsv"], cwd=tmp)
+        if result.returncode != 2:
+            test_result.add_fail("Missing patch file should exit 2", f"Exit code {result.returncode}")
+        else:
+            test_result.add_pass("Missing patch file exits 2")
+
+        # A note starting with a quote must not shift the patch line numbers
+        psa_file = Path(tmp) / "tn_PSA.tsv"
+        rows = read_tsv_file(Path(TEST_DIR) / "tn_PSA.tsv")
+        rows[1][6] = '"Blessed is the man (an unclosed quote); see Psalm 2:1.'
+        psa_file.write_text(''.join('\t'.join(row) + '\n' for row in rows), encoding='utf-8')
+        run_script(['--patch', psa_file], cwd=tmp)
+        result = run_script(['--apply-patch', Path(tmp) / "tn_PSA_patch.tsv"], cwd=tmp)
+        patched = psa_file.read_text(encoding='utf-8').split('\n')
+        if "Patched" not in result.stdout or '[Psalm 2:1](../002/001.md)' not in patched[1] or '[Acts 4:25-26]' not in patched[3]:
+            test_result.add_fail("Patch for a file with a quoted note was not applied correctly", result.stdout)
+        else:
+            test_result.add_pass("Patch line numbers survive quoted notes")
+
+
+def check_check_mode_exit_codes(test_result):
+    """Check that --check writes nothing and exits 0 when linked, 1 when links are missing and 2 on errors."""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_test_inputs(tmp)
+        before = sorted(os.listdir(tmp))
+        missing = run_script(['--check', '.'], cwd=tmp)
+        missing_all = run_script(['--check', '--all', '.'], cwd=tmp)
+        if missing.returncode != 1 or missing_all.returncode != 1 or sorted(os.listdir(tmp)) != before:
+            test_result.add_fail("--check on unlinked files should exit 1 and write nothing",
+                                 f"Exit codes {missing.returncode}, {missing_all.returncode}")
+        else:
+            test_result.add_pass("--check exits 1 when links are missing and writes nothing")
+        if "6 link(s) missing" not in missing_all.stdout:
+            test_result.add_fail("--check --all did not count every missing link", missing_all.stdout)
+        else:
+            test_result.add_pass("--check --all counts every missing link")
+
+        linked = run_script(['--check'] + [Path(TEST_DIR).resolve() / f"tn_{book}_expected.tsv" for book in TEST_BOOKS], cwd=tmp)
+        if linked.returncode != 0:
+            test_result.add_fail("--check on linked files should exit 0", f"Exit code {linked.returncode}")
+        else:
+            test_result.add_pass("--check exits 0 when files are fully linked")
+
+        broken_file = Path(tmp) / "tn_GEN.tsv"
+        broken_file.write_bytes(b"Reference\tID\n1:1\t\xff\xfe\n")
+        broken = run_script(['--check', broken_file], cwd=tmp)
+        if broken.returncode != 2:
+            test_result.add_fail("--check on an unreadable file should exit 2", f"Exit code {broken.returncode}")
+        else:
+            test_result.add_pass("--check exits 2 when a file cannot be checked")
+
+        empty_dir = Path(tmp) / "empty"
+        empty_dir.mkdir()
+        mistyped = run_script(['--check', 'nosuch.tsv'], cwd=tmp)
+        mixed = run_script(['--check', 'nosuch.tsv', Path(TEST_DIR).resolve() / "tn_MAT_expected.tsv"], cwd=tmp)
+        empty = run_script(['--check', empty_dir], cwd=tmp)
+        empty_cwd = run_script(['--check'], cwd=empty_dir)
+        exit_codes = [mistyped.returncode, mixed.returncode, empty.returncode, empty_cwd.returncode]
+        if exit_codes != [2, 2, 2, 2]:
+            test_result.add_fail("--check with missing paths or no files should exit 2", f"Exit codes {exit_codes}")
+        else:
+            test_result.add_pass("--check exits 2 for missing paths or when there is nothing to check")
+
+
+def check_watch_mode(test_result):
+    """Check that --watch links files once in full and then relinks only the rows changed by a save."""
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(Path(TEST_DIR) / "tn_MAT.tsv", tmp)
+        mat_file = Path(tmp) / "tn_MAT.tsv"
+        log_file = Path(tmp) / "watch.log"
+
+        def wait_for_log(text, timeout=10):
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                if text in log_file.read_text(encoding='utf-8'):
+                    return True
+                time.sleep(0.1)
+            return False
+
+        with open(log_file, 'w', encoding='utf-8') as log:
+            process = subprocess.Popen(
+                [sys.executable, '-u', str(Path(SCRIPT_NAME).resolve()), '-i', '--watch',
+                 '--interval', '0.1', '--debounce', '0.2', '.'],
+                stdout=log, stderr=subprocess.STDOUT, cwd=tmp
+            )
+        try:
+            started = wait_for_log("Watching")
+            initial_ok = started and read_tsv_file(mat_file) == read_tsv_file(Path(TEST_DIR) / "tn_MAT_expected.tsv")
+
+            # Save a change to one row
+            time.sleep(0.3)
+            mat_file.write_bytes(mat_file.read_bytes().replace(b"[Micah 5:2](../../mic/05/02.md)", b"Micah 5:3"))
+            relinked = wait_for_log("Relinked")
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait(timeout=10)
+
+        log = log_file.read_text(encoding='utf-8')
+        diff = read_tsv_file(Path(tmp) / "tn_MAT_diff.tsv") or []
+        if not initial_ok:
+            test_result.add_fail("--watch did not link the files in full when starting", log)
+        elif not relinked or "Relinked 1 changed row(s)" not in log:
+            test_result.add_fail("--watch did not relink only the changed row", log)
+        elif "[Micah 5:3](../../mic/05/03.md)" not in read_tsv_file(mat_file)[3][6] or len(diff) != 1 + 6 + 1:
+            test_result.add_fail("--watch lost earlier links or changes", log)
+        else:
+            test_result.add_pass("--watch relinks only the changed rows and keeps earlier changes")
+
+        # A save between reading and replacing the file must abort the relink without writing
+        before = mat_file.read_bytes()
+        result = run_python('''
+import add_scripture_links
+try:
+    add_scripture_links.relink_file("tn_MAT.tsv", (0, 0), {1, 2, 3})
+except add_scripture_links.FileChangedError:
+    print("aborted")
+''', cwd=tmp)
+        if "aborted" not in result.stdout or mat_file.read_bytes() != before:
+            test_result.add_fail("Relinking a file saved in the meantime was not aborted", result.stdout + result.stderr)
+        else:
+            test_result.add_pass("Relinking aborts without writing when the file was saved again")
+
+        invalid = run_script(['-i', '--watch', '--interval', '-1', '.'], cwd=tmp)
+        if invalid.returncode != 2 or 'Traceback' in invalid.stderr:
+            test_result.add_fail("--watch with a negative interval should be rejected", invalid.stderr)
+        else:
+            test_result.add_pass("--watch rejects a non-positive interval")
+
+
+def check_resume(test_result):
+    """Check that --resume skips journaled books, keeps their diffs and only discards stale temp files."""
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_test_inputs(tmp)
+        journal = Path(tmp) / "journal.tsv"
+
+        # Simulate a run killed right after replacing JUD in place, before anything else happened
+        run_python('''
+import sys
+import add_scripture_links
+
+write_file_if_changed = add_scripture_links.write_file_if_changed
+
+def write_then_die(output_file, text):
+    written = write_file_if_changed(output_file, text)
+    if output_file.endswith("tn_JUD.tsv"):
+        raise KeyboardInterrupt
+    return written
+
+add_scripture_links.write_file_if_changed = write_then_die
+sys.argv = ["add_scripture_links.py", "-i", "--journal", "journal.tsv", "tn_JUD.tsv"]
+add_scripture_links.main()
+''', cwd=tmp)
+
+        stale_temp = Path(tmp) / ".tn_MAT.tsv.stale.tmp"
+        live_temp = Path(tmp) / ".tn_PSA.tsv.live.tmp"
+        stale_temp.write_text("partial", encoding='utf-8')
+        live_temp.write_text("partial", encoding='utf-8')
+        old_time = time.time() - 3600
+        os.utime(stale_temp, (old_time, old_time))
+
+        result = run_script(['-i', '--journal', journal, '--resume', '--summary', 'summary.tsv', '.'], cwd=tmp)
+        summary = read_tsv_file(Path(tmp) / "summary.tsv")
+        counts = {row[0]: row[2] for row in summary[1:]} if summary else {}
+        if ("Skipping ./tn_JUD.tsv" not in result.stdout
+                or read_tsv_file(Path(tmp) / "tn_JUD_diff.tsv") != read_tsv_file(Path(TEST_DIR) / "tn_JUD_expected_diff.tsv")
+                or counts != {'JUD': '6', 'MAT': '6', 'PSA': '7'}):
+            test_result.add_fail("Interrupted in-place book was not recovered from the journal", result.stdout)
+        else:
+            test_result.add_pass("Interrupted in-place book keeps its diff and change count")
+
+        if stale_temp.exists() or not live_temp.exists():
+            test_result.add_fail("Temp files were not discarded by age",
+                                 f"stale exists: {stale_temp.exists()}, live exists: {live_temp.exists()}")
+        else:
+            test_result.add_pass("Only stale temp files are discarded")
+
+        result = run_script(['-i', '--journal', journal, '--resume', '.'], cwd=tmp)
+        if result.stdout.count("Skipping") != len(TEST_BOOKS) or "Processing" in result.stdout:
+            test_result.add_fail("--resume did not skip the journaled books", result.stdout)
+        else:
+            test_result.add_pass("--resume skips journaled books")
+
+        # A converted book whose outputs were deleted since it was journaled must be redone
+        result = run_script(['--journal', journal, 'tn_MAT.tsv'], cwd=tmp)
+        (Path(tmp) / "tn_MAT_converted.tsv").unlink()
+        result = run_script(['--journal', journal, '--resume', 'tn_MAT.tsv'], cwd=tmp)
+        if "Skipping" in result.stdout or not (Path(tmp) / "tn_MAT_converted.tsv").exists():
+            test_result.add_fail("--resume skipped a book whose output was deleted", result.stdout)
+        else:
+            test_result.add_pass("--resume redoes books whose outputs are missing")
+
+
+def check_lazy_precompute(test_result):
+    """Check that importing builds nothing up front and that the precomputed patterns link as expected."""
+    # Run in a fresh interpreter so nothing is already imported or compiled
+    child_code = '''
+import sys
+import add_scripture_links
+lazy = add_scripture_links._reference_matchers is None
+deferred = [name for name in ('argparse', 'difflib', 'subprocess', 'hashlib') if name in sys.modules]
+print(lazy, ','.join(deferred) or '-')
+'''
+    result = run_python(child_code)
+    if result.returncode != 0 or result.stdout.split() != ['True', '-']:
+        test_result.add_fail("Import is not lazy", result.stdout + result.stderr)
+    else:
+        test_result.add_pass("Import defers pattern compilation and optional modules")
+
+    child_code = f'''
+import csv
+import add_scripture_links
+
+def read_rows(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.reader(f, delimiter='\\t'))
+
+mismatched = []
+for book in {TEST_BOOKS!r}:
+    expected = read_rows(f"{TEST_DIR}/tn_{{book}}_expected.tsv")
+    for _ in range(2):  # The first call compiles the patterns, the second reuses them
+        processed, _ = add_scripture_links.add_verse_codes_to_column(read_rows(f"{TEST_DIR}/tn_{{book}}.tsv"), book)
+        if processed != expected:
+            mismatched.append(book)
+print(','.join(mismatched) or '-')
+'''
+    result = run_python(child_code)
+    if result.returncode != 0 or result.stdout.split() != ['-']:
+        test_result.add_fail("Precomputed patterns give different output", result.stdout + result.stderr)
+    else:
+        test_result.add_pass("Precomputed patterns give identical output on repeated calls")
+
+
+# Command line mode checks run by run_tests()
+MODE_CHECKS = [
+    check_shard_and_merge,
+    check_since_mode,
+    check_check_mode_exit_codes,
+    check_skip_unchanged_outputs,
+    check_patch_and_apply,
+    check_watch_mode,
+    check_resume,
+    check_lazy_precompute,
+]
+
+
 def run_tests():
     """Run all tests and return the results."""
     test_result = TestResult()
@@ -234,6 +677,15 @@ def run_tests():
             f"{book} diff file"
         )
     
+    # Exercise the command line modes in scratch directories
+    print("\n4. Testing command line modes...")
+
+    for check in MODE_CHECKS:
+        try:
+            check(test_result)
+        except Exception as e:
+            test_result.add_error(f"{check.__name__} raised an exception", e)
+    
     return test_result
 
 